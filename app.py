@@ -5,6 +5,7 @@ from flask_cors import CORS
 
 # --- 1. The Data Nexus ---
 from wca_data import wca_data
+from responses import OrjsonProvider, compress_json_response, loading_response
 
 # --- 2. Blueprint Imports ---
 from competitors import competitors_bp
@@ -19,6 +20,8 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__, template_folder='templates')
+app.json = OrjsonProvider(app)
+app.after_request(compress_json_response)
 CORS(app)
 
 # Bootstrap the centralized data immediately on startup.
@@ -45,9 +48,13 @@ def calculate_unlimited_rankings(event_id, type_param, region, target_rank):
         if not is_world and person.get("country") != region_upper:
             continue
             
-        ranks = person.get("rank", {}).get(category, [])
-        match = next((r for r in ranks if r.get("eventId") == event_id), None)
-        
+        # Plain loop-and-break: no generator object per person
+        match = None
+        for r in person.get("rank", {}).get(category, []):
+            if r.get("eventId") == event_id:
+                match = r
+                break
+
         if match:
             all_eligible.append({
                 "personId": person["id"],
@@ -96,14 +103,6 @@ def calculate_unlimited_rankings(event_id, type_param, region, target_rank):
 
 # --- 5. Routes & Blueprints ---
 
-EVENT_NAME_TO_ID = {
-    "333": "333", "222": "222", "444": "444", "555": "555", 
-    "666": "666", "777": "777", "333oh": "333oh", "333bf": "333bf", 
-    "333fm": "333fm", "clock": "clock", "minx": "minx", "pyram": "pyram", 
-    "skewb": "skewb", "sq1": "sq1", "444bf": "444bf", "555bf": "555bf", 
-    "333mbf": "333mbf"
-}
-
 @app.route('/redirect-to-hub')
 def duck_dns_bridge():
     """Tunnel entry point for Cloudflare/DuckDNS setups."""
@@ -111,16 +110,15 @@ def duck_dns_bridge():
 
 @app.route("/api/global-rankings/<region>/<type_param>/<event>")
 def get_global_rankings(region, type_param, event):
-    event_id = EVENT_NAME_TO_ID.get(event, event)
     try:
         requested_rank = int(request.args.get("rankNumber", "1"))
     except ValueError:
         return jsonify({"error": "Invalid rank number"}), 400
 
-    competitors, actual_rank = calculate_unlimited_rankings(event_id, type_param, region, requested_rank)
+    competitors, actual_rank = calculate_unlimited_rankings(event, type_param, region, requested_rank)
 
     if actual_rank == -2:
-        return jsonify({"status": "loading"}), 503
+        return loading_response({"status": "loading"})
     if not competitors:
         return jsonify({"error": "Rank out of range"}), 404
 
@@ -1,18 +1,13 @@
 import logging
 from flask import Blueprint, request, jsonify
-from wca_data import wca_data
+from wca_data import wca_data, EVENT_NAMES
+from responses import loading_response
 
 logger = logging.getLogger(__name__)
 comparison_bp = Blueprint('comparison', __name__)
 
-EVENT_MAP = {
-    "3x3 Cube": "333", "2x2 Cube": "222", "4x4 Cube": "444", "5x5 Cube": "555",
-    "6x6 Cube": "666", "7x7 Cube": "777", "3x3 One-Handed": "333oh",
-    "3x3 Blindfolded": "333bf", "3x3 Fewest Moves": "333fm",
-    "Clock": "clock", "Megaminx": "minx", "Pyraminx": "pyram",
-    "Skewb": "skewb", "Square-1": "sq1", "4x4 Blindfolded": "444bf",
-    "5x5 Blindfolded": "555bf", "3x3 Multi-Blind": "333mbf"
-}
+# Display name -> event ID, as sent by the comparison page
+EVENT_MAP = {name: e for e, name in EVENT_NAMES.items()}
 
 # --- Logic Helpers ---
 
@@ -26,12 +21,9 @@ def get_best_mbf_pace(person_obj):
     best_raw_val = None
 
     raw_results = []
-    if isinstance(results, dict):
-        for comp_events in results.values():
-            if "333mbf" in comp_events:
-                raw_results.extend(comp_events["333mbf"])
-    elif isinstance(results, list):
-        raw_results = [r for r in results if r.get("eventId") == "333mbf"]
+    for comp_events in results.values():
+        if "333mbf" in comp_events:
+            raw_results.extend(comp_events["333mbf"])
 
     for rd in raw_results:
         res_val = rd.get("best", rd.get("res", 0))
@@ -89,7 +81,7 @@ def format_result(event_id, result, is_average=False):
 @comparison_bp.route('/compare_events', methods=['GET'])
 def compare_events():
     if not wca_data.persons: 
-        return jsonify({"error": "WCA Data is loading..."}), 503
+        return loading_response({"error": "WCA Data is loading..."})
     
     e1_name = request.args.get('event1')
     e2_name = request.args.get('event2')
@@ -1,31 +1,36 @@
+from functools import lru_cache
 from flask import Blueprint, render_template, request, jsonify
 from wca_data import wca_data
+from responses import loading_response
 
 competitions_bp = Blueprint('competitions', __name__)
 
 # --- Logic Helpers ---
 
-def get_filtered_competitions(target_events, partial=True):
+@lru_cache(maxsize=1)
+def sorted_competitions(snapshot):
     """
-    Filters competitions from the centralized wca_data singleton.
+    All competitions, most recent first, with each event list as a frozenset.
+    Only changes with the data, so it is built once per published snapshot.
     """
-    # wca_data.competitions is a dict, we need the list of values
-    all_comps = list(wca_data.competitions.values())
-    
+    # snapshot.competitions is a dict, we need the list of values
+    all_comps = list(snapshot.competitions.values())
+
     # Sort most recent first: {"date": {"from": "2024-05-20", ...}}
-    sorted_comps = sorted(
-        all_comps, 
-        key=lambda c: c.get("date", {}).get("from", "0000-00-00"), 
-        reverse=True
-    )
+    all_comps.sort(key=lambda c: c.get("date", {}).get("from", "0000-00-00"), reverse=True)
+    return [(comp, frozenset(comp.get("events", []))) for comp in all_comps]
+
+def get_filtered_competitions(target_events, partial=True, snapshot=None):
+    """
+    Filters competitions from the centralized wca_data singleton.
+    """
+    sorted_comps = sorted_competitions(snapshot or wca_data.snapshot)
 
     if not target_events:
-        return sorted_comps[:100]
+        return [comp for comp, _ in sorted_comps[:100]]
 
     filtered = []
-    for comp in sorted_comps:
-        comp_events = set(comp.get("events", []))
-        
+    for comp, comp_events in sorted_comps:
         if partial:
             # INCLUSIVE: Comp must contain AT LEAST all target_events
             if target_events.issubset(comp_events):
@@ -54,8 +59,9 @@ def get_competitions_api():
         return render_template("competitions.html")
 
     # 2. Check if data is ready
-    if not wca_data.competitions:
-        return jsonify({"error": "WCA Nexus data is still loading..."}), 503
+    snapshot = wca_data.snapshot
+    if not snapshot.competitions:
+        return loading_response({"error": "WCA Nexus data is still loading..."})
 
     # 3. Handle API Logic
     partial = request.args.get("partial", "true").lower() == "true"
@@ -68,11 +74,12 @@ def get_competitions_api():
         # Exclusion logic: If user asks for FTO, it will return nothing 
         # because wca_data sanitized it out of the competition objects already.
 
-    results = get_filtered_competitions(target_events, partial)
+    results = get_filtered_competitions(target_events, partial, snapshot)
     return jsonify(results)
 
 @competitions_bp.route("/api/reload_competitions")
 def reload_cache_route():
     """Triggers the centralized WCA Nexus sync."""
-    wca_data.load() # This will trigger _run_unified_fetch in wca_data.py
+    if not wca_data.refresh():
+        return jsonify({"message": "A background refresh is already running."})
     return jsonify({"message": "Global background refresh initiated."})
\ No newline at end of file
@@ -1,79 +1,78 @@
+from functools import lru_cache
+import numpy as np
+import orjson
 from flask import Blueprint, jsonify, request
-from wca_data import wca_data
+from wca_data import wca_data, EVENT_BITS, LEGACY_EVENTS, event_mask, mask_events, parse_event_list
+from responses import payload_etag, gzip_payload, cached_json_response
 
 competitors_bp = Blueprint("competitors_bp", __name__)
 
 # --- Constants ---
 # These are the only events allowed to exist in a person's history 
 # alongside the user's selected events.
-PERMISSIBLE_REMOVED_EVENTS = {'magic', 'mmagic', '333ft', '333mbo'}
+PERMISSIBLE_REMOVED_EVENTS = LEGACY_EVENTS
 MAX_RESULTS = 1000
 
-def find_competitors(selected_events, max_results=MAX_RESULTS):
-    persons = wca_data.persons
+def find_competitors(snapshot, selected_events, max_results=MAX_RESULTS):
+    persons = snapshot.persons
     if not persons:
         return []
 
     target_set = set(selected_events)
-    if not target_set:
+    # Events outside the known vocabulary cannot be told apart in the bitmasks
+    if not target_set or not target_set.issubset(EVENT_BITS):
         return []
 
+    target_mask = event_mask(target_set)
     # The "Allowed" pool: Selected Events + Removed Events
-    allowed_pool = target_set.union(PERMISSIBLE_REMOVED_EVENTS)
-    
-    competitors = []
-
-    for person in persons:
-        p_id = person.get("id")
-        
-        # 1. Identify EVERY event this person has ever touched
-        completed_events = set()
-        
-        # Check Ranks
-        ranks = person.get("rank", {})
-        for category in ["singles", "averages"]:
-            for r in ranks.get(category, []):
-                completed_events.add(r["eventId"])
+    allowed_mask = target_mask | event_mask(PERMISSIBLE_REMOVED_EVENTS)
+    # Every event a person has ever touched (ranks + results), one uint32 per person
+    masks = snapshot.event_masks
 
-        # Check Results (to ensure we don't miss events where they didn't get a rank)
-        results = person.get("results", {})
-        if isinstance(results, dict):
-            for events in results.values():
-                completed_events.update(events.keys())
-        elif isinstance(results, list):
-            for r in results:
-                if isinstance(r, dict) and r.get("eventId"):
-                    completed_events.add(r["eventId"])
+    # THE STRICT FILTER, vectorized over the whole column:
+    # Condition A: They must have completed ALL selected events.
+    # Condition B: They must NOT have completed any events outside the allowed pool.
+    # (i.e., Their total history must be a subset of the allowed pool)
+    target = np.uint32(target_mask)
+    disallowed = np.uint32(~allowed_mask & 0xFFFFFFFF)
+    hits = np.flatnonzero(((masks & target) == target) & ((masks & disallowed) == 0))[:max_results]
 
-        # 2. THE STRICT FILTER
-        # Condition A: They must have completed ALL selected events.
-        if not target_set.issubset(completed_events):
-            continue
-            
-        # Condition B: They must NOT have completed any events outside the allowed pool.
-        # (i.e., Their total history must be a subset of the allowed pool)
-        if not completed_events.issubset(allowed_pool):
-            continue
-
-        # 3. Validation passed: Add to results
+    competitors = []
+    for i in hits.tolist():
+        person = persons[i]
         competitors.append({
-            "personId": p_id,
+            "personId": person.get("id"),
             "personName": person.get("name"),
-            "completed_events": list(completed_events),
+            "completed_events": mask_events(int(masks[i])),
             "personCountryId": person.get("country", "Unknown")
         })
-        
-        if len(competitors) >= max_results:
-            break
                 
     return competitors
 
+@lru_cache(maxsize=512)
+def get_competitors_payload(event_key, snapshot):
+    """
+    Encodes the strict-filter result for a canonical event tuple once per
+    published snapshot, built from that same snapshot.
+    Returns (body, gzipped body, etag).
+    """
+    body = orjson.dumps(find_competitors(snapshot, list(event_key)))
+    return body, gzip_payload(body), payload_etag(body)
+
+def release_competitors_payloads(snapshot):
+    """Entries keep their snapshot alive; drop them once a new build is out."""
+    get_competitors_payload.cache_clear()
+
+wca_data.on_publish(release_competitors_payloads)
+
 @competitors_bp.route("/competitors/")
 def api_get_competitors():
-    event_ids_str = request.args.get("events", "")
-    if not event_ids_str:
+    # One snapshot read, so the body, ETag and Last-Modified describe the same build
+    snapshot = wca_data.snapshot
+    # Nothing to match yet; answer uncached so clients do not keep the empty list
+    if not snapshot.persons:
         return jsonify([])
-    selected_events = [e.strip() for e in event_ids_str.split(",") if e.strip()]
-    # Perform strict filtering
-    competitors = find_competitors(selected_events)
-    return jsonify(competitors)
\ No newline at end of file
+    event_key = parse_event_list(request.args.get("events", ""))
+    # Perform strict filtering (memoised per event set and snapshot)
+    body, gzipped, etag = get_competitors_payload(event_key, snapshot)
+    return cached_json_response(body, etag, gzipped, last_modified=snapshot.fetched_at)
\ No newline at end of file
@@ -1,30 +1,25 @@
 import os
 import json
 import re
-from flask import Blueprint, jsonify
-from wca_data import wca_data
+from functools import lru_cache
+from operator import itemgetter
+import orjson
+from flask import Blueprint
+from wca_data import wca_data, EVENT_NAMES, EXCLUDED_EVENTS
+from responses import loading_response, payload_etag, gzip_payload, cached_json_response
 
 # --- Blueprint ---
 completionists_bp = Blueprint("completionists", __name__)
 
 # --- Event Definitions ---
-SINGLE_EVENTS = {"333", "222", "444", "555", "666", "777", "333oh", "333bf", "333fm",
-                 "clock", "minx", "pyram", "skewb", "sq1", "444bf", "555bf", "333mbf"}
-AVERAGE_EVENTS_SILVER = {"333", "222", "444", "555", "666", "777", "333oh",
-                         "minx", "pyram", "skewb", "sq1", "clock"}
+SINGLE_EVENTS = frozenset({"333", "222", "444", "555", "666", "777", "333oh", "333bf", "333fm",
+                           "clock", "minx", "pyram", "skewb", "sq1", "444bf", "555bf", "333mbf"})
+AVERAGE_EVENTS_SILVER = frozenset({"333", "222", "444", "555", "666", "777", "333oh",
+                                   "minx", "pyram", "skewb", "sq1", "clock"})
 AVERAGE_EVENTS_GOLD = AVERAGE_EVENTS_SILVER | {"333bf", "333fm", "444bf", "555bf"}
-
-EXCLUDED_EVENTS = {"333mbo", "magic", "mmagic", "333ft", "fto"}
-
-EVENT_NAMES = {
-    "333": "3x3 Cube", "222": "2x2 Cube", "444": "4x4 Cube",
-    "555": "5x5 Cube", "666": "6x6 Cube", "777": "7x7 Cube",
-    "333oh": "3x3 One-Handed", "333bf": "3x3 Blindfolded",
-    "333fm": "3x3 Fewest Moves", "clock": "Clock", "minx": "Megaminx",
-    "pyram": "Pyraminx", "skewb": "Skewb", "sq1": "Square-1",
-    "444bf": "4x4 Blindfolded", "555bf": "5x5 Blindfolded",
-    "333mbf": "3x3 Multi-Blind"
-}
+NO_AVERAGES = frozenset()
+PODIUM_POSITIONS = frozenset((1, 2, 3))
+WC_ID = re.compile(r"WC\d+")
 
 # ----------------- Helper Functions -----------------
 
@@ -53,46 +48,58 @@ def has_wc_podium(person):
     """Checks for podiums in competitions matching WCXXXX."""
     results = person.get("results", {})
     for comp_id, events in results.items():
-        if re.match(r"WC\d+", comp_id):
-            for event_results in events.values():
-                for r in event_results:
-                    # position is 1, 2, or 3 in a Final
-                    if r.get("round") == "Final" and r.get("position") in (1, 2, 3):
-                        return True
+        # Precompiled pattern; most competition ids fail on the first character
+        if not WC_ID.match(comp_id): continue
+        for event_results in events.values():
+            for r in event_results:
+                # position is 1, 2, or 3 in a Final
+                if r.get("round") == "Final" and r.get("position") in PODIUM_POSITIONS:
+                    return True
     return False
 
 def get_podium_coverage(person):
-    """Calculates exactly which events have which podium positions."""
+    """
+    Calculates which events have which podium positions. Stops as soon as
+    every SINGLE_EVENTS entry holds all three positions, since nothing more
+    can change the tier.
+    """
     coverage = {}
+    full_events = 0
     results = person.get("results", {})
     for comp_id, events in results.items():
-        if not isinstance(events, dict): continue
         for ev, ev_results in events.items():
             if ev in EXCLUDED_EVENTS: continue
-            if ev not in coverage: coverage[ev] = set()
+            positions = coverage.get(ev)
+            if positions is None: positions = coverage[ev] = set()
+            if len(positions) == 3: continue
             for r in ev_results:
                 if r.get("round") == "Final":
                     pos = r.get("position")
-                    if pos in (1, 2, 3):
-                        coverage[ev].add(pos)
+                    if pos in PODIUM_POSITIONS:
+                        positions.add(pos)
+            if len(positions) == 3 and ev in SINGLE_EVENTS:
+                full_events += 1
+                if full_events == len(SINGLE_EVENTS):
+                    return coverage
     return coverage
 
-def determine_category(person):
+def determine_category(person, comp_dates):
     # 0. Initialize results early
     results = person.get("results", {})
-    if not isinstance(results, dict): results = {}
 
     # 1. Eligibility Check
-    singles_ranks = {r.get("eventId") for r in person.get("rank", {}).get("singles", []) if r.get("eventId")}
-    if not SINGLE_EVENTS.issubset(singles_ranks): return None
+    rank = person.get("rank", {})
+    singles_ranks = frozenset(r.get("eventId") for r in rank.get("singles", []))
+    if not singles_ranks >= SINGLE_EVENTS: return None
 
-    averages_ranks = {r.get("eventId") for r in person.get("rank", {}).get("averages", []) if r.get("eventId")}
-    
-    category, required_averages = "Bronze", set()
-    if AVERAGE_EVENTS_GOLD.issubset(averages_ranks):
-        category, required_averages = "Gold", AVERAGE_EVENTS_GOLD.copy()
-    elif AVERAGE_EVENTS_SILVER.issubset(averages_ranks):
-        category, required_averages = "Silver", AVERAGE_EVENTS_SILVER.copy()
+    averages_ranks = frozenset(r.get("eventId") for r in rank.get("averages", []))
+
+    # The required sets are shared, read-only module constants
+    category, required_averages = "Bronze", NO_AVERAGES
+    if averages_ranks >= AVERAGE_EVENTS_GOLD:
+        category, required_averages = "Gold", AVERAGE_EVENTS_GOLD
+    elif averages_ranks >= AVERAGE_EVENTS_SILVER:
+        category, required_averages = "Silver", AVERAGE_EVENTS_SILVER
 
     # 2. Tier Upgrades (Platinum -> Palladium -> Iridium)
     if category == "Gold":
@@ -105,22 +112,20 @@ def determine_category(person):
             category = "Platinum"
             
             # Palladium Requirement: At least one {1, 2, or 3} in EVERY event
-            any_podium_coverage = all(bool({1, 2, 3} & podium_data.get(ev, set())) for ev in SINGLE_EVENTS)
+            any_podium_coverage = all(podium_data.get(ev) for ev in SINGLE_EVENTS)
             
             if any_podium_coverage:
                 category = "Palladium"
                 
                 # Iridium Requirement: WR AND Worlds Podium AND {1, 2, and 3} in EVERY event
-                full_podium_coverage = all({1, 2, 3}.issubset(podium_data.get(ev, set())) for ev in SINGLE_EVENTS)
+                full_podium_coverage = all(PODIUM_POSITIONS.issubset(podium_data.get(ev, ())) for ev in SINGLE_EVENTS)
                 if is_wr and is_wc and full_podium_coverage:
                     category = "Iridium"
 
     # 3. Date Trace
     history = []
     for comp_id, events_in_comp in results.items():
-        comp_detail = wca_data.competitions.get(comp_id)
-        if not comp_detail: continue 
-        date_till = comp_detail.get("date", {}).get("till")
+        date_till = comp_dates.get(comp_id)
         if not date_till: continue
 
         for event_id, event_results in events_in_comp.items():
@@ -133,7 +138,8 @@ def determine_category(person):
                     "hasAverage": res.get("average", -1) > 0
                 })
 
-    history.sort(key=lambda x: x["date"])
+    # ISO dates sort correctly as plain strings
+    history.sort(key=itemgetter("date"))
     done_singles, done_averages = set(), set()
     cat_date, last_ev = "N/A", "N/A"
 
@@ -142,7 +148,7 @@ def determine_category(person):
         if ev in SINGLE_EVENTS and entry["hasSingle"]: done_singles.add(ev)
         if ev in required_averages and entry["hasAverage"]: done_averages.add(ev)
         
-        if done_singles.issuperset(SINGLE_EVENTS) and done_averages.issuperset(required_averages):
+        if done_singles >= SINGLE_EVENTS and done_averages >= required_averages:
             cat_date, last_ev = entry["date"], ev
             break
 
@@ -154,18 +160,55 @@ def determine_category(person):
         "lastEvent": EVENT_NAMES.get(last_ev, last_ev)
     }
 
-# --- Flask Routes ---
-
-@completionists_bp.route("/completionists")
-def api_get_completionists():
-    if not wca_data.persons:
-        return jsonify({"error": "Data loading..."}), 503
-        
+def competition_dates(competitions):
+    """
+    Maps each dated competition to its end date, looked up once per build
+    rather than walked again for every person.
+    """
+    comp_dates = {}
+    for comp_id, comp in competitions.items():
+        date_till = comp.get("date", {}).get("till")
+        if date_till:
+            comp_dates[comp_id] = date_till
+    return comp_dates
+
+def find_completionists(snapshot):
+    """Categorises every person of a snapshot in one pass over the records."""
+    comp_dates = competition_dates(snapshot.competitions)
     results = []
-    for p in wca_data.persons:
-        res = determine_category(p)
+    for p in snapshot.persons:
+        res = determine_category(p, comp_dates)
         if res:
             results.append(res)
 
     results.sort(key=lambda x: (x["categoryDate"] if x["categoryDate"] != "N/A" else "9999-12-31", x["name"]))
-    return jsonify(results)
\ No newline at end of file
+    return results
+
+@lru_cache(maxsize=1)
+def get_completionists_payload(snapshot):
+    """
+    The list takes a full scan to build but only changes with the data, so it
+    is encoded once per published snapshot (each snapshot is one generation and
+    hashes by identity). Only the latest is kept, so old builds can be freed.
+    Returns (body, gzipped body, etag).
+    """
+    body = orjson.dumps(find_completionists(snapshot))
+    return body, gzip_payload(body), payload_etag(body)
+
+def warm_completionists_payload(snapshot):
+    """Builds the list right after a publish instead of on the first request."""
+    get_completionists_payload(snapshot)
+
+wca_data.on_publish(warm_completionists_payload)
+
+# --- Flask Routes ---
+
+@completionists_bp.route("/completionists")
+def api_get_completionists():
+    # One snapshot read, so the body, ETag and Last-Modified describe the same build
+    snapshot = wca_data.snapshot
+    if not snapshot.persons:
+        return loading_response({"error": "Data loading..."})
+
+    body, gzipped, etag = get_completionists_payload(snapshot)
+    return cached_json_response(body, etag, gzipped, last_modified=snapshot.fetched_at)
@@ -1,26 +1,40 @@
 import logging
-from flask import Blueprint, render_template, request
-from wca_data import wca_data
+from functools import lru_cache
+from flask import Blueprint, make_response, render_template, request
+from wca_data import wca_data, EVENT_NAMES
+from responses import cacheable_response
 
 events_bp = Blueprint('events', __name__)
 logger = logging.getLogger(__name__)
 
 # Project-wide excluded events (FTO is handled at the Nexus level)
-EVENT_CODE_NAMES = {
-    "222": "2x2 Cube", "333": "3x3 Cube", "444": "4x4 Cube", "555": "5x5 Cube",
-    "666": "6x6 Cube", "777": "7x7 Cube", "333bf": "3x3 Blindfolded",
-    "333oh": "3x3 One-Handed", "333fm": "3x3 Fewest Moves",
-    "clock": "Rubik's Clock", "minx": "Megaminx", "pyram": "Pyraminx",
-    "skewb": "Skewb", "sq1": "Square-1", "444bf": "4x4 Blindfolded",
-    "555bf": "5x5 Blindfolded", "333mbf": "3x3 Multi-Blind"
-}
+# This page spells out the Clock's full name
+EVENT_CODE_NAMES = {**EVENT_NAMES, "clock": "Rubik's Clock"}
 
 # --- Core Logic ---
 
-def get_event_metrics(year=None, country=None):
+@lru_cache(maxsize=1)
+def competition_years(snapshot):
+    """
+    Maps each competition id to its start year, parsed once per published
+    snapshot (one generation) instead of on every page view.
+    """
+    comp_years = {}
+    for c_id, c in snapshot.competitions.items():
+        try:
+            date_str = c.get("date", {}).get("from", "")
+            if date_str:
+                comp_years[c_id] = int(date_str[:4])
+        except (ValueError, TypeError, AttributeError):
+            continue
+    return comp_years
+
+def get_event_metrics(year=None, country=None, snapshot=None):
     """Calculates local vs international participation using the Nexus."""
+    # One snapshot for the whole pass, so a refresh cannot mix builds
+    snapshot = snapshot or wca_data.snapshot
     # Safety Gate: Return early if Nexus isn't ready
-    if not wca_data.persons or not wca_data.competitions:
+    if not snapshot.persons or not snapshot.competitions:
         return []
 
     event_stats = {}
@@ -28,13 +42,12 @@ def get_event_metrics(year=None, country=None):
     year_filter, country_filter = (year != "all"), (country != "all")
 
     # 1. Filter Competitions based on Year/Country
-    for c_id, c in wca_data.competitions.items():
+    comp_years = competition_years(snapshot)
+    for c_id, c in snapshot.competitions.items():
         try:
-            # Safely parse year
-            date_str = c.get("date", {}).get("from", "")
-            if not date_str: continue
-            
-            c_year = int(date_str[:4])
+            c_year = comp_years.get(c_id)
+            if c_year is None: continue
+
             c_country = c.get("country")
             
             if (not year_filter or c_year == year) and (not country_filter or c_country == country):
@@ -50,16 +63,11 @@ def get_event_metrics(year=None, country=None):
     if not event_stats:
         return []
 
-    # 2. Process Participation (Strictly checking for Dict types)
+    # 2. Process Participation (results are always comp -> events dicts after ingest)
     target_comp_ids = set(valid_comp_map.keys())
     
-    for p in wca_data.persons:
+    for p in snapshot.persons:
         p_res = p.get("results", {})
-        
-        # FIX: Ensure results is a dictionary before calling .keys()
-        if not isinstance(p_res, dict):
-            continue
-            
         attended_matches = target_comp_ids.intersection(p_res.keys())
         if not attended_matches:
             continue
@@ -71,11 +79,7 @@ def get_event_metrics(year=None, country=None):
             host_country = valid_comp_map.get(c_id)
             is_local = (p_country == host_country)
             
-            comp_data = p_res.get(c_id, {})
-            # FIX: Ensure competition data is a dictionary before calling .keys()
-            events_played = comp_data.keys() if isinstance(comp_data, dict) else []
-            
-            for e_code in events_played:
+            for e_code in p_res[c_id]:
                 name = EVENT_CODE_NAMES.get(e_code, e_code)
                 if name in event_stats:
                     if is_local:
@@ -115,16 +119,17 @@ def get_event_metrics(year=None, country=None):
 @events_bp.route("/events", methods=["GET", "POST"])
 def events_page():
     # Final Safety: If Nexus empty, return empty template
-    if not wca_data.competitions:
+    # One snapshot for the filters, the metrics and the cache headers
+    snapshot = wca_data.snapshot
+    if not snapshot.competitions:
         return render_template("events.html", events=[], years=[], countries=[], 
                                selected_year="all", selected_country="all", max_score=100)
 
     # Fetch filters from nexus safely
-    years = sorted({int(c["date"]["from"][:4]) for c in wca_data.competitions.values() 
-                   if isinstance(c.get("date"), dict) and "from" in c["date"]}, reverse=True)
+    years = sorted(set(competition_years(snapshot).values()), reverse=True)
     
     country_options = sorted(
-        {(c.get("country"), c.get("country")) for c in wca_data.competitions.values() if c.get("country")},
+        {(c.get("country"), c.get("country")) for c in snapshot.competitions.values() if c.get("country")},
         key=lambda x: x[1]
     )
     
@@ -132,10 +137,10 @@ def events_page():
     country_val = request.values.get("country", "all")
     processed_year = int(year_val) if year_val != "all" else "all"
 
-    events_data = get_event_metrics(year=processed_year, country=country_val)
+    events_data = get_event_metrics(year=processed_year, country=country_val, snapshot=snapshot)
     current_max_score = max((e["score"] for e in events_data), default=100)
 
-    return render_template(
+    response = make_response(render_template(
         "events.html",
         events=events_data,
         years=years,
@@ -143,4 +148,8 @@ def events_page():
         selected_year=year_val,
         selected_country=country_val,
         max_score=current_max_score
-    )
\ No newline at end of file
+    ))
+    # The page only changes when the Nexus data does; let browsers revalidate cheaply
+    if request.method == "GET":
+        response = cacheable_response(response, 300, last_modified=snapshot.fetched_at)
+    return response
\ No newline at end of file
@@ -0,0 +1,108 @@
+import gzip
+import hashlib
+import orjson
+from flask import Response, request
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+
+# --- JSON Responses ---
+
+# orjson options shared by every encoding path, so a dict that encodes in one
+# path never raises in another
+JSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+def json_options(sort_keys=False):
+    """JSON_OPTIONS, plus key sorting when requested."""
+    return (JSON_OPTIONS | orjson.OPT_SORT_KEYS) if sort_keys else JSON_OPTIONS
+
+class OrjsonProvider(JSONProvider):
+    """
+    Flask JSON provider backed by orjson, so every jsonify() call uses it.
+    Types orjson cannot encode fall back to Flask's default conversions.
+    Honours sort_keys (app.json.sort_keys) like Flask's default provider.
+    """
+    sort_keys = DefaultJSONProvider.sort_keys
+
+    def dumps(self, obj, **kwargs):
+        options = json_options(kwargs.get("sort_keys", self.sort_keys))
+        return orjson.dumps(obj, default=DefaultJSONProvider.default, option=options).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Hand the encoded bytes straight to the response, skipping the str round-trip
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=DefaultJSONProvider.default, option=json_options(self.sort_keys))
+        return self._app.response_class(body, mimetype="application/json")
+
+def ojsonify(data, status=200):
+    """orjson-backed stand-in for jsonify, used on the large list endpoints."""
+    body = orjson.dumps(data, default=DefaultJSONProvider.default, option=JSON_OPTIONS)
+    return Response(body, status=status, mimetype="application/json")
+
+def loading_response(data, retry_after=10):
+    """503 for requests that arrive before the Nexus is ready, with a Retry-After hint."""
+    response = ojsonify(data, 503)
+    response.headers["Retry-After"] = str(retry_after)
+    return response
+
+def raw_json_response(body, status=200):
+    """Wraps an already-encoded JSON body."""
+    return Response(body, status=status, mimetype="application/json")
+
+def payload_etag(body):
+    """Short content hash used as the ETag of an encoded payload."""
+    return hashlib.blake2b(body, digest_size=8).hexdigest()
+
+def gzip_payload(body):
+    """Precompresses an encoded payload once so it can be served many times."""
+    return gzip.compress(body, 6)
+
+def cacheable_response(response, max_age, etag=None, last_modified=None):
+    """
+    Marks a response as publicly cacheable for max_age seconds (served stale for
+    another minute while revalidating) and answers a matching If-None-Match or
+    If-Modified-Since with an empty 304.
+    """
+    if etag:
+        response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    response.cache_control.stale_while_revalidate = 60
+    return response.make_conditional(request)
+
+def cached_json_response(body, etag, gzipped=None, max_age=3600, last_modified=None):
+    """
+    Serves an encoded JSON body as a cacheable response under its ETag.
+    When a precompressed copy is given and the client accepts gzip, that copy
+    is sent instead under its own ETag.
+    """
+    if gzipped is not None and "gzip" in request.accept_encodings:
+        response = raw_json_response(gzipped)
+        response.headers["Content-Encoding"] = "gzip"
+        etag += "-gz"
+    else:
+        response = raw_json_response(body)
+    if gzipped is not None:
+        response.vary.add("Accept-Encoding")
+    return cacheable_response(response, max_age, etag, last_modified)
+
+def compress_json_response(response, min_size=1024):
+    """
+    after_request hook: gzips JSON bodies that were not precompressed when the
+    client accepts gzip. Small bodies are left alone, they would barely shrink.
+    """
+    if (response.status_code != 200 or response.mimetype != "application/json"
+            or response.direct_passthrough or "Content-Encoding" in response.headers):
+        return response
+    response.vary.add("Accept-Encoding")
+    if "gzip" not in request.accept_encodings:
+        return response
+    body = response.get_data()
+    if len(body) < min_size:
+        return response
+    response.set_data(gzip_payload(body))
+    response.headers["Content-Encoding"] = "gzip"
+    return response
@@ -1,52 +1,92 @@
-from flask import Blueprint, jsonify, request
-from wca_data import wca_data
+from functools import lru_cache
+import orjson
+from flask import Blueprint, request
+from wca_data import wca_data, EVENT_BITS, EVENT_NAMES, LEGACY_EVENTS, event_mask, parse_event_list
+from responses import loading_response, payload_etag, gzip_payload, cached_json_response
 
 specialist_bp = Blueprint("specialist_bp", __name__)
 
-def find_specialists(selected_events):
-    if not wca_data.persons:
+def find_specialists(snapshot, selected_events):
+    if not snapshot.persons:
         return {"error": "Loading..."}
 
     if not selected_events:
         return []
 
     target_set = set(selected_events)
-    # These events do NOT count against a specialist's "purity"
-    LEGACY_EXEMPT = {"333ft", "magic", "mmagic", "333mbo"}
+    # Events outside the known vocabulary cannot be told apart in the bitmasks
+    if not target_set.issubset(EVENT_BITS):
+        return []
+
+    # A specialist's non-legacy podium events are exactly the selected ones, so the
+    # candidates are a single bucket of the precomputed (bitmask-keyed) index.
+    # Legacy events do NOT count against a specialist's "purity"
+    target_key = event_mask(target_set - LEGACY_EVENTS)
+    # Legacy events only matter when explicitly selected (they must still be podiumed)
+    required_legacy = target_set & LEGACY_EVENTS
     
     results = []
     
-    # Iterate over pre-processed podium data from wca_data
-    for p_id, p_podiums in wca_data.podiums.items():
-        user_podium_events = set(p_podiums.keys())
-        
-        # 1. Must have at least one podium in EVERY selected event
-        if not target_set.issubset(user_podium_events):
-            continue
-            
-        # 2. Strict Filter: They can only have podiums in:
-        # (Selected Events) + (Legacy Exempt Events)
-        allowed_set = target_set.union(LEGACY_EXEMPT)
-        
-        # If they have a podium in an event NOT in the allowed set, they are a generalist
-        if not user_podium_events.issubset(allowed_set):
+    # Each bucket entry carries the person record and its counts, so no lookups are needed
+    for person, p_podiums in snapshot.specialist_index.get(target_key, ()):
+        if required_legacy and not required_legacy.issubset(p_podiums):
             continue
 
-        # 3. Fetch metadata from the main person list
-        person = next((p for p in wca_data.persons if p['id'] == p_id), None)
-        if person:
-            results.append({
-                "personId": p_id,
-                "personName": person['name'],
-                "personCountryId": person['country'],
-                # Only show the counts for the events the user is currently filtering for
-                "podiums": [{"eventId": e, "count": p_podiums[e]} for e in selected_events]
-            })
+        results.append({
+            "personId": person['id'],
+            "personName": person['name'],
+            "personCountryId": person['country'],
+            # Only show the counts for the events the user is currently filtering for
+            "podiums": [{"eventId": e, "count": p_podiums[e]} for e in selected_events]
+        })
 
     # Sort by total podiums in the target events (highest first)
     return sorted(results, key=lambda x: sum(i['count'] for i in x['podiums']), reverse=True)
 
+def requested_order(events_param, event_key):
+    """
+    The request's own event order (each result lists its podiums in it), or
+    None when it already matches the canonical key, so those share one entry.
+    """
+    if not event_key:
+        return None
+    order = tuple(e.strip() for e in events_param.split(",") if e.strip())
+    return None if order == event_key else order
+
+@lru_cache(maxsize=1024)
+def get_specialists_payload(event_key, snapshot, order=None):
+    """
+    Encodes the specialist list for a canonical event tuple once per published
+    snapshot (one generation), built from that same snapshot.
+    `order` is the requested event order when it differs from the key.
+    Returns (body, gzipped body, etag).
+    """
+    body = orjson.dumps(find_specialists(snapshot, list(order or event_key)))
+    return body, gzip_payload(body), payload_etag(body)
+
+def warm_single_event_payloads(snapshot):
+    """
+    Encodes every single-event selection of the UI as soon as a snapshot is
+    published, so the most common queries never pay for the first encode.
+    """
+    # Entries keep their snapshot alive; drop the previous build's before warming
+    get_specialists_payload.cache_clear()
+    for event_id in EVENT_NAMES:
+        get_specialists_payload((event_id,), snapshot)
+
+wca_data.on_publish(warm_single_event_payloads)
+
 @specialist_bp.route("/specialists")
 def api_get_specialists():
-    events = [e.strip() for e in request.args.get("events", "").split(",") if e.strip()]
-    return jsonify(find_specialists(events))
\ No newline at end of file
+    # One snapshot read, so the body, ETag and Last-Modified describe the same build
+    snapshot = wca_data.snapshot
+    # Never block the request thread on the sync; the client retries on 503
+    if not snapshot.persons:
+        return loading_response({"error": "Loading..."})
+
+    events_param = request.args.get("events", "")
+    # The canonical key drives the index lookup and the cache; podiums keep the request's order
+    event_key = parse_event_list(events_param)
+    order = requested_order(events_param, event_key)
+    body, gzipped, etag = get_specialists_payload(event_key, snapshot, order)
+    return cached_json_response(body, etag, gzipped, last_modified=snapshot.fetched_at)
\ No newline at end of file
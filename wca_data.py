@@ -1,216 +1,727 @@
 import os
-import json
+import orjson
 import msgpack
+import zstandard
 import asyncio
 import aiohttp
 import threading
 import tempfile
+import time
+import atexit
 import logging
 import sys
+import numpy as np
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from functools import lru_cache
+
+try:
+    import uvloop
+except ImportError:  # uvloop does not build on Windows
+    uvloop = None
 
 logger = logging.getLogger(__name__)
 
+# Round identifiers that count as a final (every spelling the API uses, so the
+# hot loop tests membership without str()/lower()), and podium placings
+_FINAL_ROUNDS = frozenset(("Final", "final", "FINAL", "f", "F", "c", "C"))
+# Case-insensitive forms checked for any other spelling
+_FINAL_ROUND_NAMES = frozenset(("final", "f", "c"))
+_PODIUM_POSITIONS = frozenset((1, 2, 3))
+
+# --- Event Bitmasks ---
+# Every known event (current, legacy and hidden) owns one bit, so an event set is
+# a single int; events outside the vocabulary all share OTHER_EVENT_BIT.
+EVENT_IDS = ("333", "222", "444", "555", "666", "777", "333oh", "333bf", "333fm",
+             "clock", "minx", "pyram", "skewb", "sq1", "444bf", "555bf", "333mbf",
+             "333mbo", "magic", "mmagic", "333ft", "fto")
+EVENT_BITS = {e: 1 << i for i, e in enumerate(EVENT_IDS)}
+OTHER_EVENT_BIT = 1 << len(EVENT_IDS)
+
+# --- Event Classes (shared by every blueprint) ---
+# LEGACY: Used for Specialist 'Purity' checks but hidden from general UI
+LEGACY_EVENTS = frozenset(("333mbo", "magic", "mmagic", "333ft"))
+# HIDDEN: Strictly excluded from the entire project (FTO)
+HIDDEN_EVENTS = frozenset(("fto",))
+# Combined set for general filtering
+EXCLUDED_EVENTS = LEGACY_EVENTS | HIDDEN_EVENTS
+
+# Display names of the events shown in the UI (legacy/hidden events have none);
+# the blueprints derive their own lookups from this one table
+EVENT_NAMES = {
+    "333": "3x3 Cube", "222": "2x2 Cube", "444": "4x4 Cube",
+    "555": "5x5 Cube", "666": "6x6 Cube", "777": "7x7 Cube",
+    "333oh": "3x3 One-Handed", "333bf": "3x3 Blindfolded",
+    "333fm": "3x3 Fewest Moves", "clock": "Clock", "minx": "Megaminx",
+    "pyram": "Pyraminx", "skewb": "Skewb", "sq1": "Square-1",
+    "444bf": "4x4 Blindfolded", "555bf": "5x5 Blindfolded",
+    "333mbf": "3x3 Multi-Blind"
+}
+
+
+def event_mask(event_ids):
+    """Folds event IDs into a bitmask."""
+    mask = 0
+    for e in event_ids:
+        mask |= EVENT_BITS.get(e, OTHER_EVENT_BIT)
+    return mask
+
+
+EVENT_ORDER = {e: i for i, e in enumerate(EVENT_IDS)}
+
+
+def canonical_event_key(event_ids):
+    """Deduplicates event IDs into a tuple in EVENT_IDS order (unknown IDs last)."""
+    return tuple(sorted(set(event_ids), key=lambda e: (EVENT_ORDER.get(e, len(EVENT_IDS)), e)))
+
+
+@lru_cache(maxsize=4096)
+def parse_event_list(events_param):
+    """
+    Turns a raw comma-separated ?events= string into its canonical event tuple,
+    for use as a cache key. A selection with an unknown event matches nobody,
+    so it collapses to () like an empty one.
+    """
+    events = {e.strip() for e in events_param.split(",")}
+    events.discard("")
+    if not events.issubset(EVENT_BITS):
+        return ()
+    return canonical_event_key(events)
+
+
+def mask_events(mask):
+    """Expands a bitmask back into known event IDs (in EVENT_IDS order)."""
+    return [e for e in EVENT_IDS if mask & EVENT_BITS[e]]
+
+
+def _new_event_loop():
+    """Returns a uvloop loop where available, falling back to the stdlib loop."""
+    return uvloop.new_event_loop() if uvloop else asyncio.new_event_loop()
+
+class NexusSnapshot:
+    """
+    One consistent build of the nexus data. A build is published by swapping
+    the whole snapshot in one assignment, so a reader that takes
+    wca_data.snapshot once sees persons and indexes from the same build.
+    """
+    __slots__ = ("persons", "competitions", "podiums", "specialist_index", "event_masks", "generation", "fetched_at")
+
+    def __init__(self, persons, competitions, podiums, specialist_index, event_masks, generation, fetched_at=None):
+        self.persons = persons
+        self.competitions = competitions
+        self.podiums = podiums                    # personId -> {eventId: podium_count}
+        self.specialist_index = specialist_index  # bitmask of non-legacy podium events -> [(person, podium counts)]
+        self.event_masks = event_masks            # uint32 bitmask of every event in ranks/results, row-aligned with persons
+        self.generation = generation              # bumped whenever the derived stats are rebuilt
+        self.fetched_at = fetched_at              # unix time the data was fetched upstream (Last-Modified)
+
 class WCAData:
     _instance = None
     _lock = threading.Lock()
 
     def __new__(cls):
-        with cls._lock:
-            if cls._instance is None:
-                cls._instance = super(WCAData, cls).__new__(cls)
-                cls._instance._initialized = False
+        # Fast path: once created, the instance is returned without touching the lock
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    instance = super(WCAData, cls).__new__(cls)
+                    instance._initialized = False
+                    cls._instance = instance
         return cls._instance
 
     def __init__(self):
         if self._initialized: return
         
         # --- Central Storage ---
-        self.persons = []
-        self.competitions = {} 
-        self.podiums = {}      # personId -> {eventId: podium_count}
+        # Replaced wholesale on every build; the properties below read through it
+        self.snapshot = NexusSnapshot([], {}, {}, {}, np.zeros(0, dtype=np.uint32), 0)
+        # Set once the first snapshot is published; lock-free to check, and
+        # scripts can block on it with ready.wait(timeout)
+        self.ready = threading.Event()
+        # Callables run with each newly published snapshot (see on_publish)
+        self._publish_hooks = []
+        # Single worker, started on the first publish: hooks never run on the
+        # publishing thread, and successive publishes are warmed in order
+        self._hook_executor = None
         self.is_loading = False
         
-        # --- Constraints & Logic Filters ---
-        # LEGACY: Used for Specialist 'Purity' checks but hidden from general UI
-        self.LEGACY = {"333mbo", "magic", "mmagic", "333ft"}
-        # HIDDEN: Strictly excluded from the entire project (FTO)
-        self.HIDDEN = {"fto"}
-        # Combined set for general filtering
-        self.EXCLUDED = self.LEGACY.union(self.HIDDEN)
+        # --- Constraints & Logic Filters (the shared module-level event classes) ---
+        self.LEGACY = LEGACY_EVENTS
+        self.HIDDEN = HIDDEN_EVENTS
+        self.EXCLUDED = EXCLUDED_EVENTS
+        # Person fields read by the blueprints; everything else is dropped at ingest
+        self.PERSON_FIELDS = ("id", "name", "country", "rank", "records", "results")
         
         self.TOTAL_PERSON_PAGES = 268
         self.TOTAL_COMP_PAGES = 18
+
+        # --- Fetch Concurrency ---
+        # Candidate semaphore sizes probed on the first sync; the fastest one is
+        # remembered in the cache metadata and reused by later syncs.
+        self.FETCH_CONCURRENCY_LEVELS = (4, 8, 16, 32, 64)
+        # Until a knee is learned, a cold sync is not throttled: use the widest level
+        self.DEFAULT_FETCH_CONCURRENCY = max(self.FETCH_CONCURRENCY_LEVELS)
+        self.fetch_concurrency = None
+        # Fresh 200 downloads so far; the knee probe measures only these, since
+        # 304s and cached fallbacks say nothing about download throughput
+        self._downloads = 0
+        # url -> (ETag or None, parsed page) from the last good fetch; refreshes send
+        # If-None-Match and reuse the parsed page on 304, so only changed pages are
+        # downloaded, and a page that fails to fetch falls back to its last copy
+        self._page_cache = {}
+        # Transient failures (timeouts, 429, 5xx) are retried with exponential backoff
+        self.FETCH_RETRIES = 3
+        self.FETCH_BACKOFF = 0.5
+
+        # --- Scheduled Refresh ---
+        # Every finished sync (or cache load) books the next one on the nexus loop
+        self.REFRESH_INTERVAL = 24 * 3600
+        # A sync that came back empty or mostly failed is retried this much sooner
+        self.SYNC_RETRY_DELAY = 5 * 60
+        self._refresh_handle = None
         
-        # --- MsgPack Cache Paths ---
+        # --- MsgPack Cache Paths (zstd-compressed) ---
         self.cache_dir = tempfile.gettempdir()
-        self.p_cache = os.path.join(self.cache_dir, "wca_nexus_persons_v3.msgpack")
-        self.c_cache = os.path.join(self.cache_dir, "wca_nexus_comps_v3.msgpack")
+        # One vault file holds every fetched page with its ETag, so a restart can
+        # refresh conditionally: {"competitions": [[url, etag, items], ...], "persons": [...]}
+        self.vault = os.path.join(self.cache_dir, "wca_nexus_vault_v7.msgpack.zst")
+        self.m_cache = os.path.join(self.cache_dir, "wca_nexus_meta_v4.msgpack")
+        self.CACHE_ZSTD_LEVEL = 3
+
+        # --- Background Event Loop (started lazily, reused by every sync) ---
+        self._loop = None
+        self._session = None
+        atexit.register(self._close_session)
         
         self._initialized = True
 
     # --- Fixed Data Processing Logic ---
 
-    def _sanitize_person(self, p):
+    # --- Snapshot Accessors ---
+    # Fine for single reads; read wca_data.snapshot once when combining several.
+
+    @property
+    def persons(self): return self.snapshot.persons
+
+    @property
+    def competitions(self): return self.snapshot.competitions
+
+    @property
+    def podiums(self): return self.snapshot.podiums
+
+    @property
+    def specialist_index(self): return self.snapshot.specialist_index
+
+    @property
+    def generation(self): return self.snapshot.generation
+
+    def _sanitize_person(self, raw):
         """
         Cleans results of truly hidden events (FTO).
         Preserves Legacy events in results so specialist.py can verify purity.
+        Only PERSON_FIELDS are kept so the unused API payload is released with its page.
         """
+        p = {k: raw[k] for k in self.PERSON_FIELDS if k in raw}
         raw_results = p.get("results", {})
+        # Every record leaves here in one shape, { "CompID": { "eventId": [rounds] } },
+        # so nothing downstream has to branch on the API's alternate formats
         sanitized_results = {}
 
         if isinstance(raw_results, dict):
-            # Dict Format: { "CompID": { "eventId": [rounds] } }
             for cid, evs in raw_results.items():
                 if isinstance(evs, dict):
                     # Keep everything EXCEPT truly hidden events
                     sanitized_results[cid] = {eid: r for eid, r in evs.items() if eid not in self.HIDDEN}
         
         elif isinstance(raw_results, list):
-            # List Format: Filter objects/strings
-            sanitized_results = []
+            # List Format: regroup round objects by competition. Only dicts with an
+            # eventId ever counted (for the event masks and podiums alike); bare
+            # strings and eventId-less items are dropped, as they always were.
+            # Rounds without a competitionId still counted, so they go under "".
             for item in raw_results:
-                if isinstance(item, dict):
-                    if item.get("eventId") not in self.HIDDEN:
-                        sanitized_results.append(item)
-                elif item not in self.HIDDEN:
-                    sanitized_results.append(item)
+                if not isinstance(item, dict): continue
+                eid = item.get("eventId")
+                if not eid or eid in self.HIDDEN: continue
+                comp = sanitized_results.setdefault(item.get("competitionId") or "", {})
+                comp.setdefault(sys.intern(eid), []).append(item)
 
         p["results"] = sanitized_results
 
-        # Sanitize Ranks (Remove HIDDEN, keep LEGACY)
-        ranks = p.get("rank", {})
-        if isinstance(ranks, dict):
-            for r_type in ["singles", "averages"]:
-                if r_type in ranks and isinstance(ranks[r_type], list):
-                    ranks[r_type] = [r for r in ranks[r_type] if r.get("eventId") not in self.HIDDEN]
+        # Sanitize Ranks (Remove HIDDEN, keep LEGACY); both lists always present
+        ranks = p.get("rank")
+        ranks = dict(ranks) if isinstance(ranks, dict) else {}
+        for r_type in ("singles", "averages"):
+            r_list = ranks.get(r_type)
+            ranks[r_type] = [r for r in r_list if r.get("eventId") not in self.HIDDEN] if isinstance(r_list, list) else []
+        p["rank"] = ranks
         
+        return self._intern_shared_strings(p)
+
+    def _intern_shared_strings(self, p):
+        """
+        Interns eventId and country values so the ~20 event and ~200 country
+        strings are shared by every record. Names are left alone: nearly all are
+        unique, so interning them would only grow the intern table.
+        Dict keys need no help: orjson and msgpack already share decoded keys.
+        """
+        intern = sys.intern
+        if isinstance(p.get("country"), str):
+            p["country"] = intern(p["country"])
+        ranks = p["rank"]
+        for r_type in ("singles", "averages"):
+            for r in ranks[r_type]:
+                if isinstance(r.get("eventId"), str):
+                    r["eventId"] = intern(r["eventId"])
         return p
 
-    def _process_global_stats(self):
-        """Performs a deep scan of all results to build the podium database."""
+    def _sanitize_page(self, page):
+        """Reduces a fetched person page to its sanitized records, interning WCA IDs."""
+        people = []
+        for raw in page.get("items", []):
+            p_id = raw.get("id")
+            if not p_id: continue
+            p = self._sanitize_person(raw)
+            p["id"] = sys.intern(p_id)
+            people.append(p)
+        return people
+
+    def _sanitize_comp_page(self, page):
+        """Reduces a fetched competition page to its items, with UI-excluded events dropped."""
+        items = page.get("items", [])
+        for item in items:
+            item["events"] = [sys.intern(e) for e in item.get("events", []) if e not in self.EXCLUDED]
+        return items
+
+    def _collect_competitions(self, pages):
+        """Merges sanitized competition pages into a dict keyed by competition id."""
+        comps = {}
+        for page in pages:
+            if not page: continue
+            for item in page:
+                comps[item["id"]] = item
+        return comps
+
+    def _collect_persons(self, pages):
+        """
+        Deduplicates sanitized person pages by WCA ID.
+        Pagination can repeat a person across pages; the last copy wins.
+        """
+        by_id = {}
+        for page in pages:
+            if not page: continue
+            for p in page:
+                by_id[p["id"]] = p
+        return list(by_id.values())
+
+    def _process_global_stats(self, persons, competitions, fetched_at=None):
+        """
+        Performs a deep scan of all results to build the podium database.
+        Everything is built in locals and published at the end as one snapshot
+        swap, so readers never see half-built or mixed structures and need no lock.
+        """
         new_podiums = {}
-        for p in self.persons:
+        new_index = {}
+        mask_column = []
+        is_podium = self._is_podium  # bound once; called for every round
+        for p in persons:
             p_id = p.get('id')
-            if not p_id: continue
-            
-            p_stats = {}
-            results = p.get("results", {})
+            if not p_id:
+                mask_column.append(0)
+                continue
             
-            # Deep Scan Logic: Handle both Dict and List structures from the API
-            if isinstance(results, dict):
-                for comp_events in results.values():
-                    if not isinstance(comp_events, dict): continue
-                    for e_id, rounds in comp_events.items():
-                        for rd in rounds:
-                            self._extract_podium(p_stats, e_id, rd)
+            results = p["results"]
+            ranks = p["rank"]
+            completed = {r.get("eventId") for cat in ("singles", "averages") for r in ranks[cat]}
             
-            elif isinstance(results, list):
-                for rd in results:
-                    e_id = rd.get("eventId")
-                    if e_id:
-                        self._extract_podium(p_stats, e_id, rd)
+            # Deep Scan: flatten comp -> event in C; the competition IDs are never needed
+            event_rounds = list(chain.from_iterable(comp_events.items() for comp_events in results.values()))
+            completed.update(e_id for e_id, _ in event_rounds)
+            podium_events = [e_id for e_id, rounds in event_rounds for rd in rounds if is_podium(rd)]
+
+            completed.discard(None)
+            mask_column.append(event_mask(completed))
             
-            if p_stats:
-                new_podiums[p_id] = p_stats
+            if podium_events:
+                # One C-level count per person instead of an increment per podium
+                counts = new_podiums[p_id] = dict(Counter(podium_events))
+                key = event_mask(e for e in counts if e not in self.LEGACY)
+                # References, not copies: the record and counts are shared with persons/podiums
+                new_index.setdefault(key, []).append((p, counts))
                 
-        self.podiums = new_podiums
-        print(f"📊 Global Stats: Deep-scanned {len(self.podiums)} podium sets.", file=sys.stderr)
+        # --- Publish ---
+        snapshot = NexusSnapshot(persons, competitions, new_podiums, new_index,
+                                 np.array(mask_column, dtype=np.uint32), self.generation + 1, fetched_at)
+        self.snapshot = snapshot
+        self.ready.set()
+        print(f"📊 Global Stats: Deep-scanned {len(new_podiums)} podium sets.", file=sys.stderr)
+
+        # Warm-ups (a full completionist scan, the single-event encodes) run on
+        # the hook worker, so load() under _lock and the nexus loop do not wait
+        if self._publish_hooks:
+            if self._hook_executor is None:
+                self._hook_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="wca-nexus-hooks")
+            self._hook_executor.submit(self._run_publish_hooks, snapshot)
+
+    def _run_publish_hooks(self, snapshot):
+        # Every hook gets the snapshot just built, even if another publish follows
+        for hook in self._publish_hooks:
+            try:
+                hook(snapshot)
+            except Exception as e:
+                logger.error(f"WCA Nexus publish hook failed: {e}")
+
+    def on_publish(self, hook):
+        """
+        Registers hook(snapshot) to run after every snapshot is published. Hooks
+        run one at a time on a background worker, after the snapshot is live
+        and ready is set, so they cost nothing at startup or on the nexus loop;
+        requests arriving before a warm-up finishes simply build their own
+        response. Blueprints use it to precompute hot responses.
+        """
+        self._publish_hooks.append(hook)
 
-    def _extract_podium(self, p_stats, e_id, rd):
+    def _is_podium(self, rd):
         """Normalizes round and position keys to catch every valid podium."""
-        # Normalize Round
-        r_type = str(rd.get("round", rd.get("roundTypeId", ""))).lower()
-        is_final = r_type in ["final", "f", "c"]
-        
-        # Normalize Position
-        pos = rd.get("position", rd.get("pos"))
-        
-        # Ensure it's a valid time/score (best > 0)
-        best = rd.get("best", -1)
+        get = rd.get
+        # Normalize Position first: only 3 rows per round can podium, so most exit
+        # here before the round name is looked at
+        pos = get("position")
+        if pos is None:
+            pos = get("pos")
+        if pos not in _PODIUM_POSITIONS:
+            return False
 
-        if is_final and pos in {1, 2, 3} and best > 0:
-            if e_id not in p_stats:
-                p_stats[e_id] = 0
-            p_stats[e_id] += 1
+        # Normalize Round: the usual spellings hit the set directly, anything else
+        # is compared case-insensitively
+        r_type = get("round")
+        if r_type is None:
+            r_type = get("roundTypeId")
+        if r_type not in _FINAL_ROUNDS and str(r_type).lower() not in _FINAL_ROUND_NAMES:
+            return False
+
+        # Ensure it's a valid time/score (best > 0)
+        return get("best", -1) > 0
 
     # --- Async Networking ---
 
-    async def _fetch_url(self, session, url, semaphore):
-        async with semaphore:
-            try:
-                async with session.get(url, timeout=25) as res:
-                    if res.status != 200: return None
-                    return json.loads(await res.read())
-            except Exception:
-                return None
+    async def _fetch_url(self, session, url, semaphore, parse=None):
+        """
+        Conditionally fetches one page: an unchanged page (304) or a failed request
+        returns the copy parsed on the last sync. Transient failures are retried,
+        sleeping outside the semaphore so the slot serves other pages meanwhile.
+        `parse` reduces a fresh page to what the caller keeps, so the raw page is
+        freed right away.
+        """
+        cached = self._page_cache.get(url)
+        headers = {"If-None-Match": cached[0]} if cached and cached[0] else None
+        for attempt in range(self.FETCH_RETRIES + 1):
+            if attempt:
+                await asyncio.sleep(self.FETCH_BACKOFF * 2 ** (attempt - 1))
+            async with semaphore:
+                try:
+                    async with session.get(url, timeout=25, headers=headers) as res:
+                        if res.status == 304 and cached: return cached[1]
+                        if res.status == 200:
+                            page = orjson.loads(await res.read())
+                            etag = res.headers.get("ETag")
+                            self._downloads += 1
+                            break
+                        # Other client errors will not go away on retry
+                        if res.status != 429 and res.status < 500:
+                            return cached and cached[1]
+                except Exception:
+                    pass
+        else:
+            return cached and cached[1]
+
+        if parse:
+            page = parse(page)
+        # Without an ETag the page is still kept as the fallback copy, but never
+        # paired with the previous page's validator
+        self._page_cache[url] = (etag, page)
+        return page
+
+    async def _gather_pages(self, session, urls, concurrency, parse=None):
+        """
+        Fetches pages with bounded concurrency and stores each one as soon as it
+        arrives (already reduced by `parse`), so raw pages can be freed while later
+        pages are still downloading. Slots keep URL order.
+        """
+        sem = asyncio.Semaphore(concurrency)
+
+        async def fetch(i, url):
+            return i, await self._fetch_url(session, url, sem, parse)
+
+        pages = [None] * len(urls)
+        for next_page in asyncio.as_completed([fetch(i, url) for i, url in enumerate(urls)]):
+            i, page = await next_page
+            pages[i] = page
+        return pages
+
+    async def _fetch_pages(self, session, urls, parse=None):
+        """
+        Fetches pages in order. Without a learned concurrency, the leading pages are
+        fetched in probe batches (two waves per candidate level, widest first so a
+        cold sync starts at full width) and the level with the best rate of fresh
+        downloads per second is kept for the rest. A probe that downloaded nothing
+        (all 304s or fallbacks) learns nothing and is repeated on the next sync.
+        """
+        probe_size = sum(2 * n for n in self.FETCH_CONCURRENCY_LEVELS)
+        if self.fetch_concurrency or len(urls) <= probe_size:
+            return await self._gather_pages(session, urls, self.fetch_concurrency or self.DEFAULT_FETCH_CONCURRENCY, parse)
+
+        pages, pos = [], 0
+        best_n, best_rate = self.DEFAULT_FETCH_CONCURRENCY, 0.0
+        for n in sorted(self.FETCH_CONCURRENCY_LEVELS, reverse=True):
+            batch = urls[pos:pos + 2 * n]
+            pos += len(batch)
+            downloads, start = self._downloads, time.perf_counter()
+            batch_pages = await self._gather_pages(session, batch, n, parse)
+            rate = (self._downloads - downloads) / (time.perf_counter() - start)
+            if rate > best_rate:
+                best_n, best_rate = n, rate
+            pages.extend(batch_pages)
+
+        if best_rate:
+            self.fetch_concurrency = best_n
+            print(f"🎛️ Fetch concurrency knee: {best_n} ({best_rate:.1f} pages/s)", file=sys.stderr)
+        pages.extend(await self._gather_pages(session, urls[pos:], best_n, parse))
+        return pages
 
     async def _run_unified_fetch(self):
-        self.is_loading = True
-        sem = asyncio.Semaphore(15)
-        connector = aiohttp.TCPConnector(limit=50)
+        synced = False
+        try:
+            synced = await self._sync_from_api()
+        finally:
+            # Always release the guard so a failed sync can be retried, and retry
+            # soon rather than a full interval later when nothing was published
+            self.is_loading = False
+            self._schedule_refresh(None if synced else self.SYNC_RETRY_DELAY)
+
+    async def _get_session(self):
+        """
+        Returns the long-lived HTTP session. It lives on the nexus loop, so its
+        keep-alive connections to raw.githubusercontent.com survive between syncs.
+        """
+        if self._session is None or self._session.closed:
+            # Size the pool for the widest probe level so the semaphore, not the
+            # connector, is what bounds concurrency (all pages share one host).
+            pool = max(self.FETCH_CONCURRENCY_LEVELS)
+            connector = aiohttp.TCPConnector(limit=pool, limit_per_host=pool, keepalive_timeout=60, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    def _close_session(self):
+        """Closes the shared HTTP session on interpreter exit."""
+        if self._session is None or self._session.closed or not self._loop.is_running():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result(timeout=5)
+        except Exception:
+            pass
+
+    async def _sync_from_api(self):
+        session = await self._get_session()
+        print("🌐 Syncing with WCA API...", file=sys.stderr)
         
-        async with aiohttp.ClientSession(connector=connector) as session:
-            print("🌐 Syncing with WCA API...", file=sys.stderr)
-            
-            # Fetch Competitions
-            comp_tasks = [self._fetch_url(session, f"https://raw.githubusercontent.com/robiningelbrecht/wca-rest-api/master/api/competitions-page-{i}.json", sem) 
-                         for i in range(1, self.TOTAL_COMP_PAGES + 1)]
-            comp_results = await asyncio.gather(*comp_tasks)
-            
-            new_comps = {}
-            for page in comp_results:
-                if page:
-                    for item in page.get("items", []):
-                        # Filter competition events for UI
-                        item["events"] = [e for e in item.get("events", []) if e not in self.EXCLUDED]
-                        new_comps[item["id"]] = item
-            self.competitions = new_comps
-
-            # Fetch Persons
-            person_tasks = [self._fetch_url(session, f"https://raw.githubusercontent.com/robiningelbrecht/wca-rest-api/master/api/persons-page-{i}.json", sem) 
-                           for i in range(1, self.TOTAL_PERSON_PAGES + 1)]
-            person_results = await asyncio.gather(*person_tasks)
-            
-            new_persons = []
-            for page in person_results:
-                if page:
-                    new_persons.extend([self._sanitize_person(p) for p in page.get("items", [])])
-            self.persons = new_persons
-
-            self._process_global_stats()
-            self._save_to_disk()
+        # Fetch Competitions
+        comp_urls = [f"https://raw.githubusercontent.com/robiningelbrecht/wca-rest-api/master/api/competitions-page-{i}.json"
+                     for i in range(1, self.TOTAL_COMP_PAGES + 1)]
+        comp_results = await self._fetch_pages(session, comp_urls, self._sanitize_comp_page)
+        
+        new_comps = self._collect_competitions(comp_results)
+
+        # Fetch Persons
+        person_urls = [f"https://raw.githubusercontent.com/robiningelbrecht/wca-rest-api/master/api/persons-page-{i}.json"
+                       for i in range(1, self.TOTAL_PERSON_PAGES + 1)]
+        # Pages are sanitized as they arrive, so only slim records are held at once
+        person_results = await self._fetch_pages(session, person_urls, self._sanitize_page)
+        
+        new_persons = self._collect_persons(person_results)
+
+        # Never replace the served data (or the vault) with an empty or mostly
+        # failed fetch; the current snapshot stays up and the sync is retried soon
+        failed = sum(1 for page in comp_results + person_results if page is None)
+        if not new_persons or not new_comps or failed * 2 > len(comp_results) + len(person_results):
+            print(f"⚠️ WCA Data Nexus: Sync failed ({failed} pages missing), keeping current data.", file=sys.stderr)
+            return False
+
+        self._process_global_stats(new_persons, new_comps, time.time())
+        if failed:
+            # Serve the partial build, but keep the last complete vault on disk and
+            # retry soon; a later boot must not trust a degraded build for a day
+            print(f"⚠️ WCA Data Nexus: Sync published with {failed} pages missing, not cached.", file=sys.stderr)
+            return False
+
+        self._save_to_disk(self._vault_entries(comp_urls, comp_results),
+                           self._vault_entries(person_urls, person_results))
             
-        self.is_loading = False
         print("⚡ WCA Data Nexus: Sync Complete and Cached.", file=sys.stderr)
+        return True
 
     # --- Disk & Lifecycle ---
 
-    def _save_to_disk(self):
+    def _vault_entries(self, urls, pages):
+        """
+        Pairs each fetched page with its URL and current ETag for the vault. Only
+        called for complete syncs, so every URL has its page.
+        """
+        return [[url, (self._page_cache.get(url) or (None,))[0], page]
+                for url, page in zip(urls, pages)]
+
+    def _restore_pages(self, entries):
+        """
+        Returns the pages stored in vault entries and re-seeds the page cache, so
+        the next sync sends If-None-Match, only downloads pages that changed, and
+        falls back to these copies for pages that fail.
+        """
+        pages = []
+        for url, etag, page in entries:
+            self._page_cache[url] = (etag, page)
+            pages.append(page)
+        return pages
+
+    def _save_to_disk(self, comp_entries, person_entries):
         try:
-            with open(self.p_cache, "wb") as f:
-                f.write(msgpack.packb(self.persons, use_bin_type=True))
-            with open(self.c_cache, "wb") as f:
-                f.write(msgpack.packb(self.competitions, use_bin_type=True))
+            self._write_atomic(self.vault, lambda f: self._pack_vault(f, comp_entries, person_entries))
+            meta = msgpack.packb({"fetch_concurrency": self.fetch_concurrency}, use_bin_type=True)
+            self._write_atomic(self.m_cache, lambda f: f.write(meta))
         except Exception as e:
             logger.error(f"Failed to save MsgPack: {e}")
 
+    def _pack_vault(self, f, comp_entries, person_entries):
+        """
+        Streams the vault map into `f` one page entry at a time through the zstd
+        compressor, so the full serialized blob is never built in memory. The
+        result decodes exactly like msgpack.packb of the whole map.
+        """
+        packer = msgpack.Packer(use_bin_type=True)
+        cctx = zstandard.ZstdCompressor(level=self.CACHE_ZSTD_LEVEL)
+        with cctx.stream_writer(f, closefd=False) as z:
+            z.write(packer.pack_map_header(2))
+            for key, entries in (("competitions", comp_entries), ("persons", person_entries)):
+                z.write(packer.pack(key))
+                z.write(packer.pack_array_header(len(entries)))
+                for entry in entries:
+                    z.write(packer.pack(entry))
+
+    @staticmethod
+    def _write_atomic(path, write):
+        """
+        Runs write(f) against a sibling temp file and renames it over `path`, so a
+        process killed mid-write leaves the previous cache intact instead of a
+        torn one.
+        """
+        tmp = path + ".tmp"
+        try:
+            with open(tmp, "wb") as f:
+                write(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+    def _read_vault(self, path):
+        """
+        Stream-decodes the zstd-compressed msgpack vault file. Neither the
+        compressed nor the decompressed bytes are ever held in full; the unpacker
+        pulls 1 MiB chunks through the decompressor as it builds the objects.
+        """
+        with open(path, "rb") as f, zstandard.ZstdDecompressor().stream_reader(f) as reader:
+            return msgpack.Unpacker(reader, raw=False, read_size=1 << 20).unpack()
+
+    def _load_meta(self):
+        """Restores sync tuning (e.g. the learned fetch concurrency) from the last run."""
+        if not os.path.exists(self.m_cache): return
+        try:
+            with open(self.m_cache, "rb") as f:
+                meta = msgpack.unpackb(f.read(), raw=False)
+            if meta.get("fetch_concurrency") in self.FETCH_CONCURRENCY_LEVELS:
+                self.fetch_concurrency = meta["fetch_concurrency"]
+        except Exception:
+            logger.warning("Ignoring unreadable WCA Nexus metadata")
+
     def load(self):
         with self._lock:
-            if self.persons or self.is_loading: return
+            if self.ready.is_set() or self.is_loading: return
+            self._load_meta()
 
-            if os.path.exists(self.p_cache) and os.path.exists(self.c_cache):
+            if os.path.exists(self.vault):
                 try:
-                    with open(self.p_cache, "rb") as f:
-                        self.persons = msgpack.unpackb(f.read(), raw=False)
-                    with open(self.c_cache, "rb") as f:
-                        self.competitions = msgpack.unpackb(f.read(), raw=False)
+                    vault = self._read_vault(self.vault)
+                    comp_pages = self._restore_pages(vault["competitions"])
+                    person_pages = self._restore_pages(vault["persons"])
+                    for page in person_pages:
+                        for p in page:
+                            self._intern_shared_strings(p)
+                    for page in comp_pages:
+                        for c in page:
+                            c["events"] = [sys.intern(e) for e in c.get("events", [])]
                     
-                    self._process_global_stats()
+                    # Only complete syncs are written, right after they finish, so the mtime is
+                    # the fetch time of a full build
+                    fetched_at = os.path.getmtime(self.vault)
+                    self._process_global_stats(self._collect_persons(person_pages),
+                                               self._collect_competitions(comp_pages), fetched_at)
                     print("✅ WCA Data Nexus: Loaded from MsgPack vault.", file=sys.stderr)
+                    # Serve the vault now; a stale one is refreshed in the background
+                    # right away, and unchanged pages come back as cheap 304s
+                    delay = max(0.0, self.REFRESH_INTERVAL - (time.time() - fetched_at))
+                    self._get_loop().call_soon_threadsafe(self._schedule_refresh, delay)
                     return
                 except Exception:
                     print("⚠️ Cache corrupt, refetching...", file=sys.stderr)
 
-            threading.Thread(target=lambda: asyncio.run(self._run_unified_fetch()), daemon=True).start()
+            self._start_sync()
+
+    def refresh(self):
+        """
+        Starts a background re-sync while the current data keeps being served.
+        Returns False if a sync is already running.
+        """
+        with self._lock:
+            if self.is_loading: return False
+            self._start_sync()
+            return True
+
+    def _start_sync(self):
+        # Callers hold _lock, so concurrent callers cannot start a second sync
+        self.is_loading = True
+        self._submit(self._run_unified_fetch())
+
+    def _schedule_refresh(self, delay=None):
+        """
+        Books the next refresh on the nexus loop, REFRESH_INTERVAL from now unless
+        a delay is given; must run on that loop.
+        """
+        if self._refresh_handle is not None:
+            self._refresh_handle.cancel()
+        if delay is None:
+            delay = self.REFRESH_INTERVAL
+        self._refresh_handle = self._loop.call_later(delay, self.refresh)
+
+    def _get_loop(self):
+        """Returns the nexus event loop, starting its daemon thread on first use."""
+        if self._loop is None:
+            self._loop = _new_event_loop()
+            threading.Thread(target=self._loop.run_forever, name="wca-nexus-loop", daemon=True).start()
+        return self._loop
+
+    def _submit(self, coro):
+        """Schedules a coroutine on the shared loop without blocking the caller."""
+        future = asyncio.run_coroutine_threadsafe(coro, self._get_loop())
+        future.add_done_callback(self._log_task_failure)
+        return future
+
+    @staticmethod
+    def _log_task_failure(future):
+        if not future.cancelled() and future.exception():
+            logger.error(f"WCA Nexus background task failed: {future.exception()}")
 
 wca_data = WCAData()
\ No newline at end of file